@@ -1,5 +1,7 @@
 import re
 
+import pandas as pd
+
 class ComparisonUtil:
     @staticmethod
     def clean_text(text):
@@ -24,4 +26,20 @@ class ComparisonUtil:
         # Convert the cleaned text to lowercase
         cleaned_text = cleaned_text.lower()
 
-        return cleaned_text
\ No newline at end of file
+        return cleaned_text
+
+    @staticmethod
+    def load_essays(csv_path):
+        """
+        Load essays from a CSV file and return them as a dictionary.
+
+        Args:
+            csv_path (str): The path to the CSV file containing the essays.
+
+        Returns:
+            dict:
+                A dictionary whose keys are essay IDs, and whose values are the
+                full texts.
+        """
+        data_file = pd.read_csv(csv_path)
+        return dict(zip(data_file['essay_id'], data_file['full_text']))  # Returns a dictionary {essay_id: full_text}
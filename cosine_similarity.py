@@ -9,6 +9,17 @@ Made By Scott Sanchez and Mihir Bhakta for CS5300.
 """
 
 class CosineSimilarityMethod:
+    @staticmethod
+    def get_config():
+        """
+        Return the parameters that affect this method's similarity scores.
+        The cosine similarity method has no parameters, so this is empty.
+
+        Returns:
+            dict: The method's configuration.
+        """
+        return {}
+
     @staticmethod
     def calc_word_frequencies(unique_words, text1_arr, text2_arr):
         """
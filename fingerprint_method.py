@@ -9,6 +9,18 @@ class FingerprintMethod:
     N_GRAM_SIZE = 4  # Class-level constant for n-gram size
     PRIME_MOD = 3    # Class-level constant for prime modulus
 
+    @staticmethod
+    def get_config():
+        """
+        Return the parameters that affect this method's similarity scores.
+        Changing any of them changes the scores, so cached scores are keyed
+        by this configuration.
+
+        Returns:
+            dict: The method's configuration.
+        """
+        return {'n_gram_size': FingerprintMethod.N_GRAM_SIZE, 'prime_mod': FingerprintMethod.PRIME_MOD}
+
     @staticmethod
     def generate_n_grams(text):
         """
@@ -1,9 +1,10 @@
-import pandas as pd
 from timeit import default_timer as timer
 
+from comparison_util import ComparisonUtil
 from cosine_similarity import CosineSimilarityMethod
 from fingerprint_method import FingerprintMethod
 from semantically_matching_paragraph_counter_method import SmpcMethod
+from score_normalization import make_normalizer, normalize_csv_scores
 import os
 import csv
 
@@ -26,117 +27,52 @@ OUTPUT_PATH = './output/similarity_results_500.csv'
 FUNCTION_WORDLIST_PATH = 'resources/words_lists/function_words.txt'
 CORE_VOCAB_WORDLIST_PATH = 'resources/words_lists/core_vocab_words.txt'
 
-def load_essays(csv_path):
-    """
-    Load essays from a CSV file and return them as a dictionary
-
-    Args:
-        csv_path (str): The path to the CSV file containing the essays.
-
-    Returns:
-        dict:
-            A dictionary whose keys are essay IDs, and whose values are the
-            full texts.
-    """
-    data_file = pd.read_csv(csv_path)
-    return dict(zip(data_file['essay_id'], data_file['full_text']))  # Returns a dictionary {essay_id: full_text}
-
-def normalize_data(results):
-    """
-    Normalize similarity scores in the results to a range between 0 and 1 using
-    Min-Max normalization.
-
-    Args:
-        results (dict):
-            A dict whose keys are tuples of (essay_id_a,essay_id_b) and whose 
-            values are tuples of (time_taken, similarity_score). The similarity
-            scores will be normalized. All else is left alone.
-    """
-    all_scores = [measurement[1] for measurement in results.values()]
-    max_value = max(all_scores)
-    min_value = min(all_scores)
-
-    if max_value == min_value:
-        # If all values are the same, normalize them to 1.0. We do this
-        # manually, because running the calculation would require dividing by
-        # zero.
-        for key in results:
-            time_taken, similarity_score = results[key]
-            results[key] = (time_taken, 1)
-    else:
-        # Otherwise, apply the Min-Max normalization formula
-        for key in results:
-            time_taken, similarity_score = results[key]
-
-            normalized_score = (similarity_score - min_value) / (max_value - min_value)
-            results[key] = (time_taken, normalized_score)
-
-def save_results_to_csv(results, output_path):
-    """
-    Save all results to a csv.
-    """
-    with open(output_path, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(['Method', 'Essay A ID', 'Essay B ID', 'Time Taken', 'Similarity Score'])
-
-        for method_name, method_results in results.items():
-            for pair, measurement in method_results.items():
-                essay_a_id, essay_b_id = pair
-                time_taken, similarity_score = measurement
-                writer.writerow([method_name, essay_a_id, essay_b_id, time_taken, similarity_score])
-
+# How to normalize the SMPC scores: "min-max" or "percentile"
+SMPC_NORMALIZATION = 'min-max'
 
 def main():
     """
     Using each method, compare each essay to every other essay.
 
-    Save the results as a csv.
+    Save the results as a csv, writing each result as soon as it is computed.
     """
-    essays = load_essays(DATA_PATH)  # Load essays as {essay_id: full_text}
-    results = {}  # Results for each method
+    essays = ComparisonUtil.load_essays(DATA_PATH)  # Load essays as {essay_id: full_text}
 
     # Load the wordlists used by the Semantically Matching Paragraph Counter method.
     SmpcMethod.load_wordlists(FUNCTION_WORDLIST_PATH, CORE_VOCAB_WORDLIST_PATH)
 
-    cosine_method_results = {}
-    fingerprint_method_results = {}
-    smpc_method_results = {}
+    # The SMPC scores are normalized once they have all been written, so keep
+    # track of them as they go by.
+    smpc_normalizer = make_normalizer(SMPC_NORMALIZATION)
 
     essay_ids = list(essays.keys())  # List of essay IDs
 
-    # Compare each pair of essays based on their essay IDs
-    for i, essay_a_id in enumerate(essay_ids):
-        for essay_b_id in essay_ids[i + 1:]:  # Compare only with essays after essay_a_id to avoid double counting
-            essay_a_text = essays[essay_a_id]
-            essay_b_text = essays[essay_b_id]
-
-            start = timer()
-            similarity_score = SmpcMethod.compare_texts(essay_a_text, essay_b_text)
-            end = timer()
-            time_taken = end - start
-            smpc_method_results[(essay_a_id, essay_b_id)] = (time_taken, similarity_score)
-
-            start = timer()
-            similarity_score = CosineSimilarityMethod.compare_texts(essay_a_text, essay_b_text)
-            end = timer()
-            time_taken = end - start
-            cosine_method_results[(essay_a_id, essay_b_id)] = (time_taken, similarity_score)
-
-            start = timer()
-            similarity_score = FingerprintMethod.compare_texts(essay_a_text, essay_b_text)
-            end = timer()
-            time_taken = end - start
-            fingerprint_method_results[(essay_a_id, essay_b_id)] = (time_taken, similarity_score)
-
-    normalize_data(smpc_method_results)
-
-    # Store results
-    results['SMPC'] = smpc_method_results
-    results['Cosine'] = cosine_method_results
-    results['Fingerprint'] = fingerprint_method_results
-
-    # Save all results to CSV
-    save_results_to_csv(results, OUTPUT_PATH)
+    with open(OUTPUT_PATH, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Method', 'Essay A ID', 'Essay B ID', 'Time Taken', 'Similarity Score'])
+
+        # Run each method over every pair in turn, so that the rows of each
+        # method are grouped together in the output.
+        for method_name, method_class in [("SMPC", SmpcMethod),
+                                          ("Cosine", CosineSimilarityMethod),
+                                          ("Fingerprint", FingerprintMethod)]:
+            # Compare each pair of essays based on their essay IDs
+            for i, essay_a_id in enumerate(essay_ids):
+                for essay_b_id in essay_ids[i + 1:]:  # Compare only with essays after essay_a_id to avoid double counting
+                    essay_a_text = essays[essay_a_id]
+                    essay_b_text = essays[essay_b_id]
+
+                    start = timer()
+                    similarity_score = method_class.compare_texts(essay_a_text, essay_b_text)
+                    end = timer()
+                    time_taken = end - start
+
+                    if method_name == "SMPC":
+                        smpc_normalizer.update(similarity_score)
+                    writer.writerow([method_name, essay_a_id, essay_b_id, time_taken, similarity_score])
+
+    # Now that every score is written, normalize the SMPC scores in place.
+    normalize_csv_scores(OUTPUT_PATH, 'SMPC', smpc_normalizer)
 
 
 if __name__ == '__main__':
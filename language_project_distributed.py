@@ -0,0 +1,208 @@
+import argparse
+import csv
+import json
+import os
+import time
+from multiprocessing import Process
+from timeit import default_timer as timer
+
+from comparison_util import ComparisonUtil
+from cosine_similarity import CosineSimilarityMethod
+from fingerprint_method import FingerprintMethod
+from semantically_matching_paragraph_counter_method import SmpcMethod
+from score_normalization import NORMALIZERS, make_normalizer, normalize_csv_scores
+from tile_scheduler import FileTileQueue, Tile, make_tiles, run_worker, tile_output_path, wait_for_tiles
+
+"""
+This program compares each essay in the database with every other essay,
+spreading the work across many worker processes, which may run on different
+machines.
+
+The program runs in one of three modes:
+
+    * coordinator: Split the comparisons into tiles, hand them out through a
+      queue directory, wait for the workers to finish them, and then combine
+      the tile outputs into one CSV file.
+    * worker: Take tiles from the queue directory and compare the essays in
+      them, until no tiles are left.
+    * local: Run a coordinator and several workers on this machine.
+
+The queue directory, the data file and the output directory must be on a
+filesystem that the coordinator and every worker can see.
+
+Made by Scott Sanchez and Mihir Bhakta for CS5300: Introduction to Artificial Intelligence.
+"""
+
+# Paths
+DATA_PATH = './resources/data/train500.csv'
+OUTPUT_PATH = './output/similarity_results_distributed.csv'
+QUEUE_DIR = './output/tile_queue'
+FUNCTION_WORDLIST_PATH = 'resources/words_lists/function_words.txt'
+CORE_VOCAB_WORDLIST_PATH = 'resources/words_lists/core_vocab_words.txt'
+
+# How to normalize the SMPC scores: "min-max" or "percentile"
+SMPC_NORMALIZATION = 'min-max'
+
+METHODS = {
+    "SMPC": SmpcMethod,
+    "Cosine": CosineSimilarityMethod,
+    "Fingerprint": FingerprintMethod,
+}
+
+
+def manifest_path(queue_dir):
+    """
+    Return the path of the queue's manifest, which tells workers which data
+    file to load and which methods to run. The coordinator writes it after
+    all the tiles are on the queue, so a worker that sees it knows the queue
+    is ready.
+    """
+    return os.path.join(queue_dir, 'manifest.json')
+
+
+def tiles_output_dir(queue_dir):
+    """Return the directory that workers write tile outputs to."""
+    return os.path.join(queue_dir, 'outputs')
+
+
+def merge_tile_outputs(queue_dir, output_path, smpc_normalizer):
+    """
+    Copy the raw scores from every finished tile into one CSV file, one row
+    at a time, feeding each SMPC score to the given normalizer on the way.
+
+    Args:
+        queue_dir (str): The queue directory.
+        output_path (str): The path of the combined CSV file.
+        smpc_normalizer (StreamingMinMax or ScoreHistogram): The normalizer that tracks the SMPC scores.
+    """
+    done_dir = os.path.join(queue_dir, 'done')
+
+    with open(output_path, mode='w', newline='') as output_file:
+        writer = csv.writer(output_file)
+        writer.writerow(['Method', 'Essay A ID', 'Essay B ID', 'Similarity Score'])
+
+        for file_name in sorted(os.listdir(done_dir)):
+            with open(os.path.join(done_dir, file_name), 'r') as f:
+                tile = Tile.from_dict(json.load(f))
+
+            with open(tile_output_path(tiles_output_dir(queue_dir), tile), 'r', newline='') as tile_file:
+                reader = csv.reader(tile_file)
+                next(reader)  # Skip the header
+                for method_name, essay_a_id, essay_b_id, similarity_score in reader:
+                    if method_name == 'SMPC':
+                        smpc_normalizer.update(float(similarity_score))
+                    writer.writerow([method_name, essay_a_id, essay_b_id, similarity_score])
+
+
+def start_run(queue_dir, data_path, method_names, tile_size, lease_seconds, max_attempts):
+    """
+    Set up a run: put every tile on the queue, then write the manifest that
+    lets the workers start.
+
+    Returns:
+        FileTileQueue: The queue holding the run's tiles.
+    """
+    if os.path.exists(manifest_path(queue_dir)):
+        raise RuntimeError(f"{queue_dir} already holds a run. Remove it or use a different queue directory.")
+
+    essays = ComparisonUtil.load_essays(data_path)
+    queue = FileTileQueue(queue_dir, lease_seconds=lease_seconds, max_attempts=max_attempts)
+    os.makedirs(tiles_output_dir(queue_dir), exist_ok=True)
+    queue.put_tiles(make_tiles(len(essays), tile_size))
+
+    with open(manifest_path(queue_dir), 'w') as f:
+        json.dump({'data_path': data_path, 'methods': method_names}, f)
+
+    return queue
+
+
+def finish_run(queue, queue_dir, output_path, smpc_normalization):
+    """
+    Wait for the workers to finish every tile, then save the combined results
+    to a CSV.
+    """
+    start_time = timer()
+    counts = wait_for_tiles(queue)
+    end_time = timer()
+    print(f"All tiles finished in {end_time - start_time} seconds: {counts}")
+    if counts['failed']:
+        print(f"Warning: {counts['failed']} tiles failed, and their pairs are missing from the output.")
+
+    # Save all results to CSV
+    smpc_normalizer = make_normalizer(smpc_normalization)
+    merge_tile_outputs(queue_dir, output_path, smpc_normalizer)
+
+    # Normalize the results for SMPC method
+    normalize_csv_scores(output_path, 'SMPC', smpc_normalizer)
+
+
+def work(queue_dir, lease_seconds, max_attempts):
+    """
+    Run a worker: wait for the coordinator to set up the queue, then process
+    tiles until none are left.
+    """
+    while not os.path.exists(manifest_path(queue_dir)):
+        time.sleep(1)
+
+    with open(manifest_path(queue_dir), 'r') as f:
+        manifest = json.load(f)
+
+    essays = ComparisonUtil.load_essays(manifest['data_path'])
+    essay_ids = list(essays.keys())
+    essay_texts = [essays[essay_id] for essay_id in essay_ids]
+
+    # Load the wordlists for SMPC
+    SmpcMethod.load_wordlists(FUNCTION_WORDLIST_PATH, CORE_VOCAB_WORDLIST_PATH)
+
+    queue = FileTileQueue(queue_dir, lease_seconds=lease_seconds, max_attempts=max_attempts)
+    methods = [(method_name, METHODS[method_name]) for method_name in manifest['methods']]
+    completed = run_worker(queue, essay_ids, essay_texts, methods, tiles_output_dir(queue_dir),
+                           renew_seconds=lease_seconds / 4)
+    print(f"Worker {os.getpid()} completed {completed} tiles.")
+
+
+def main():
+    """
+    Parse the command line and run in the requested mode.
+    """
+    parser = argparse.ArgumentParser(description="Compare every pair of essays, spread across many workers.")
+    parser.add_argument('mode', choices=['coordinator', 'worker', 'local'])
+    parser.add_argument('--queue-dir', default=QUEUE_DIR)
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--output-path', default=OUTPUT_PATH)
+    parser.add_argument('--methods', nargs='+', choices=list(METHODS), default=list(METHODS))
+    parser.add_argument('--tile-size', type=int, default=50,
+                        help="The number of essays along each side of a tile.")
+    parser.add_argument('--lease-seconds', type=float, default=600,
+                        help="How long a worker may go without renewing its tile before it is given to another worker.")
+    parser.add_argument('--max-attempts', type=int, default=3,
+                        help="How many times a tile may be lost or fail before it is given up on.")
+    parser.add_argument('--smpc-normalization', choices=list(NORMALIZERS), default=SMPC_NORMALIZATION,
+                        help="How to normalize the SMPC scores.")
+    parser.add_argument('--workers', type=int, default=8,
+                        help="The number of worker processes to start in local mode.")
+    args = parser.parse_args()
+
+    if args.mode == 'worker':
+        work(args.queue_dir, args.lease_seconds, args.max_attempts)
+        return
+
+    # Set the run up before starting any local workers, so that they never
+    # see a manifest left over from an earlier run.
+    queue = start_run(args.queue_dir, args.data_path, args.methods, args.tile_size,
+                      args.lease_seconds, args.max_attempts)
+
+    workers = []
+    if args.mode == 'local':
+        for _ in range(args.workers):
+            worker = Process(target=work, args=(args.queue_dir, args.lease_seconds, args.max_attempts))
+            worker.start()
+            workers.append(worker)
+
+    finish_run(queue, args.queue_dir, args.output_path, args.smpc_normalization)
+
+    for worker in workers:
+        worker.join()
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,12 @@
-import pandas as pd
 from timeit import default_timer as timer
 from multiprocessing import Pool
+from comparison_util import ComparisonUtil
 from cosine_similarity import CosineSimilarityMethod
 from fingerprint_method import FingerprintMethod
 from semantically_matching_paragraph_counter_method import SmpcMethod
+from pair_score_cache import PairScoreCache
+from score_normalization import make_normalizer, normalize_csv_scores
+from itertools import islice
 import csv
 
 """
@@ -23,93 +26,102 @@ Made by Scott Sanchez and Mihir Bhakta for CS5300: Introduction to Artificial In
 # Paths
 DATA_PATH = './resources/data/train150.csv'
 OUTPUT_PATH = './output/similarity_results.csv'
+CACHE_PATH = './output/pair_score_cache.sqlite'
 FUNCTION_WORDLIST_PATH = 'resources/words_lists/function_words.txt'
 CORE_VOCAB_WORDLIST_PATH = 'resources/words_lists/core_vocab_words.txt'
 
+# How to normalize the SMPC scores: "min-max" or "percentile"
+SMPC_NORMALIZATION = 'min-max'
 
-def load_essays(csv_path):
-    """
-    Load essays from a CSV file and return them as a dictionary.
+# The number of pairs to look up in the cache, compare, and store at a time
+COMPARISON_BATCH_SIZE = 10000
 
-    Args:
-        csv_path (str): The path to the CSV file containing the essays.
 
-    Returns:
-        dict:
-            A dictionary whose keys are essay IDs and whose values are the
-            full texts.
+def compare_pair(task):
     """
-    data_file = pd.read_csv(csv_path)
-    return dict(zip(data_file['essay_id'], data_file['full_text']))
-
-
-def normalize_data(results):
-    """
-    Normalize similarity scores in the results to a range between 0 and 1 using Min-Max normalization.
-
-    Args:
-        results (dict): A dict with (essay_id_a, essay_id_b) keys and similarity score values.
+    Compare one pair of texts. This unpacks a (method, text_a, text_b) task so
+    that it can be handed to `Pool.imap()`, which passes a single argument.
     """
-    max_value = max(results.values())
-    min_value = min(results.values())
+    method, text_a, text_b = task
+    return method.compare_texts(text_a, text_b)
 
-    if max_value == min_value:
-        for key in results.keys():
-            results[key] = 1.0
-    else:
-        for key in results:
-            results[key] = (results[key] - min_value) / (max_value - min_value)
 
-
-def save_results_to_csv(results, output_path):
-    """
-    Save all results to a CSV file.
-
-    Args:
-        results (dict): The dictionary containing results from different methods.
-        output_path (str): Path to save the output CSV.
+def run_comparisons_in_parallel(essay_ids, essay_texts, method, num_docs, method_name=None, cache=None):
     """
-    with open(output_path, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(['Method', 'Essay A ID', 'Essay B ID', 'Similarity Score'])
-
-        for method_name, method_results in results.items():
-            for pair, similarity_score in method_results.items():
-                essay_a_id, essay_b_id = pair
-                writer.writerow([method_name, essay_a_id, essay_b_id, similarity_score])
+    Run comparisons for a given method in parallel, yielding each result as
+    soon as it is available, in pair order.
 
-def run_comparisons_in_parallel(essay_ids, essay_texts, method, num_docs):
-    """
-    Run comparisons for a given method in parallel.
+    If a cache is given, pairs whose scores are already in the cache are not
+    compared again, and the scores of newly compared pairs are added to it.
 
     Args:
         essay_ids (list): A list of essay IDs.
         essay_texts (list): A list of all essay texts.
         method (class): The comparison method class to use.
         num_docs (int): Total number of documents.
+        method_name (str): The name the cache stores this method's scores under.
+        cache (PairScoreCache): The cache of previously computed scores, or None.
 
-    Returns:
-        dict: A dictionary where keys are (essay_id_a, essay_id_b) tuples and
-              values are similarity scores.
+    Yields:
+        tuple: A ((essay_id_a, essay_id_b), similarity_score) tuple for each pair.
     """
-    tasks = [(essay_ids[i], essay_ids[j], essay_texts[i], essay_texts[j]) for i in range(num_docs) for j in range(i + 1, num_docs)]
+    if cache is not None:
+        content_hashes = [PairScoreCache.content_hash(text) for text in essay_texts]
+        config_hash = PairScoreCache.config_hash(method.get_config())
 
-    with Pool(processes=8) as pool:
-        results = pool.starmap(method.compare_texts, [(task[2], task[3]) for task in tasks], chunksize=100)
+    # The pairs are handled one batch at a time, so that memory use depends on
+    # the batch size rather than on the number of pairs. Each batch is large
+    # enough to keep every worker process busy.
+    all_pairs = ((i, j) for i in range(num_docs) for j in range(i + 1, num_docs))
+    num_cached = 0
+    num_compared = 0
 
-    # Reformat results as a dictionary with essay ID pairs
-    comparison_results = {(tasks[i][0], tasks[i][1]): results[i] for i in range(len(results))}
-    return comparison_results
+    with Pool(processes=8) as pool:
+        while True:
+            batch = list(islice(all_pairs, COMPARISON_BATCH_SIZE))
+            if not batch:
+                break
+
+            cached_scores = {}
+            if cache is not None:
+                # Only compare the pairs that the cache doesn't already have a score for
+                cached_scores = cache.get_many(method_name, config_hash,
+                                               [(content_hashes[i], content_hashes[j]) for i, j in batch])
+                tasks = [(i, j) for i, j in batch if (content_hashes[i], content_hashes[j]) not in cached_scores]
+            else:
+                tasks = batch
+
+            computed_scores = pool.imap(compare_pair, [(method, essay_texts[i], essay_texts[j]) for i, j in tasks],
+                                        chunksize=100)
+            new_cache_entries = {}
+
+            for i, j in batch:
+                if cache is not None and (content_hashes[i], content_hashes[j]) in cached_scores:
+                    similarity_score = cached_scores[(content_hashes[i], content_hashes[j])]
+                else:
+                    similarity_score = next(computed_scores)
+                    if cache is not None:
+                        new_cache_entries[(content_hashes[i], content_hashes[j])] = similarity_score
+
+                yield (essay_ids[i], essay_ids[j]), similarity_score
+
+            if new_cache_entries:
+                cache.put_many(method_name, config_hash, new_cache_entries)
+            num_cached += len(batch) - len(tasks)
+            num_compared += len(tasks)
+
+    if cache is not None:
+        print(f"{method_name}: {num_cached} pairs served from cache, {num_compared} compared.")
 
 
 def main():
     """
     Using each method, compare each essay to every other essay.
 
-    Save the results as a CSV.
+    Save the results as a CSV, writing each result as soon as it is computed.
     """
     # Load essays
-    essays = load_essays(DATA_PATH)
+    essays = ComparisonUtil.load_essays(DATA_PATH)
     essay_ids = list(essays.keys())
     essay_texts = [essays[essay_id] for essay_id in essay_ids]
     num_docs = len(essay_texts)
@@ -117,27 +129,41 @@ def main():
     # Load the wordlists for SMPC
     SmpcMethod.load_wordlists(FUNCTION_WORDLIST_PATH, CORE_VOCAB_WORDLIST_PATH)
 
-    # Store results
-    results = {}
+    # The SMPC scores are normalized once they have all been written, so keep
+    # track of them as they go by.
+    smpc_normalizer = make_normalizer(SMPC_NORMALIZATION)
+
+    # Open the cache of scores computed by previous runs
+    cache = PairScoreCache(CACHE_PATH)
+
+    with open(OUTPUT_PATH, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Method', 'Essay A ID', 'Essay B ID', 'Similarity Score'])
 
-    # Run comparisons for each method
-    for method_name, method_class in [("Cosine", CosineSimilarityMethod),
-                                      ("SMPC", SmpcMethod),
-                                      ("Fingerprint", FingerprintMethod)]:
-        print(f"Running {method_name} comparisons...")
+        # Run comparisons for each method
+        for method_name, method_class in [("Cosine", CosineSimilarityMethod),
+                                          ("SMPC", SmpcMethod),
+                                          ("Fingerprint", FingerprintMethod)]:
+            print(f"Running {method_name} comparisons...")
 
-        start_time = timer()
-        method_results = run_comparisons_in_parallel(essay_ids, essay_texts, method_class, num_docs)
-        end_time = timer()
+            # Scores from an older configuration of this method can never be reused.
+            cache.evict_stale(method_name, PairScoreCache.config_hash(method_class.get_config()))
 
-        results[method_name] = method_results
-        print(f"{method_name} comparisons completed in {end_time - start_time} seconds.")
+            start_time = timer()
+            for pair, similarity_score in run_comparisons_in_parallel(essay_ids, essay_texts, method_class, num_docs,
+                                                                       method_name=method_name, cache=cache):
+                essay_a_id, essay_b_id = pair
+                if method_name == "SMPC":
+                    smpc_normalizer.update(similarity_score)
+                writer.writerow([method_name, essay_a_id, essay_b_id, similarity_score])
+            end_time = timer()
 
-    # Normalize the results for SMPC method
-    normalize_data(results['SMPC'])
+            print(f"{method_name} comparisons completed in {end_time - start_time} seconds.")
+
+    cache.close()
 
-    # Save all results to CSV
-    save_results_to_csv(results, OUTPUT_PATH)
+    # Normalize the results for SMPC method
+    normalize_csv_scores(OUTPUT_PATH, 'SMPC', smpc_normalizer)
 
 
 if __name__ == '__main__':
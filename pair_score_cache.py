@@ -0,0 +1,179 @@
+"""
+This class stores similarity scores on disk, so that pairs of essays that have
+already been compared do not need to be compared again on later runs.
+
+Each score is keyed by:
+
+    * The content hash of Essay A
+    * The content hash of Essay B
+    * The name of the method that produced the score
+    * A hash of that method's configuration (e.g. the n-gram size used by the
+      Fingerprint Method, or the wordlists used by the SMPC Method)
+
+Because the keys depend on the essays' contents rather than on their IDs, a
+rerun after a few essays are added or edited only has to compute the pairs
+that actually changed.
+
+Made by Scott Sanchez and Mihir Bhakta for CS5300: Introduction to Artificial Intelligence.
+"""
+import hashlib
+import json
+import sqlite3
+
+
+class PairScoreCache:
+    # SQLite limits how many parameters a single query may have, so bulk
+    # lookups are split into batches of this many pairs.
+    LOOKUP_BATCH_SIZE = 200
+
+    def __init__(self, db_path):
+        """
+        Open (or create) the cache stored at the given path.
+
+        Args:
+            db_path (str): The path to the SQLite database file.
+        """
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pair_scores (
+                hash_a TEXT NOT NULL,
+                hash_b TEXT NOT NULL,
+                method TEXT NOT NULL,
+                config_hash TEXT NOT NULL,
+                score REAL,
+                PRIMARY KEY (method, config_hash, hash_a, hash_b)
+            )
+            """
+        )
+        self.connection.commit()
+
+    def close(self):
+        """Close the connection to the database."""
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def content_hash(text):
+        """
+        Return a hash of the given text. Two essays with identical texts will
+        always have the same hash, regardless of their essay IDs.
+
+        Args:
+            text (str): The text to hash.
+
+        Returns:
+            str: The SHA-256 hex digest of the text.
+        """
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def config_hash(config):
+        """
+        Return a hash of a method's configuration.
+
+        Args:
+            config (dict):
+                The method's configuration, as returned by the method's
+                `get_config()` function.
+
+        Returns:
+            str: The SHA-256 hex digest of the configuration.
+        """
+        serialized_config = json.dumps(config, sort_keys=True)
+        return hashlib.sha256(serialized_config.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def pair_key(hash_a, hash_b):
+        """
+        Put a pair of content hashes into a fixed order.
+
+        Every method is symmetric (comparing A to B gives the same score as
+        comparing B to A), so both orderings of a pair share one entry.
+        """
+        return (hash_a, hash_b) if hash_a <= hash_b else (hash_b, hash_a)
+
+    def get_many(self, method_name, config_hash, hash_pairs):
+        """
+        Look up the scores of many pairs at once.
+
+        Args:
+            method_name (str): The name of the method (e.g. "SMPC").
+            config_hash (str): The hash of the method's configuration.
+            hash_pairs (list of tuple of str):
+                A list of (content_hash_a, content_hash_b) tuples.
+
+        Returns:
+            dict:
+                A dict whose keys are the (content_hash_a, content_hash_b)
+                tuples that were found in the cache, and whose values are
+                their scores. Pairs that are not in the cache are left out.
+        """
+        found_scores = {}
+        unique_keys = list({self.pair_key(*pair) for pair in hash_pairs})
+
+        for start in range(0, len(unique_keys), PairScoreCache.LOOKUP_BATCH_SIZE):
+            batch = unique_keys[start:start + PairScoreCache.LOOKUP_BATCH_SIZE]
+            placeholders = ', '.join(['(?, ?)'] * len(batch))
+            parameters = [method_name, config_hash] + [h for key in batch for h in key]
+            rows = self.connection.execute(
+                f"""
+                SELECT hash_a, hash_b, score FROM pair_scores
+                WHERE method = ? AND config_hash = ?
+                AND (hash_a, hash_b) IN (VALUES {placeholders})
+                """,
+                parameters,
+            )
+            for hash_a, hash_b, score in rows:
+                # SQLite stores NaN scores (e.g. a cosine similarity involving
+                # an empty essay) as NULL, so turn them back into NaN.
+                found_scores[(hash_a, hash_b)] = float('nan') if score is None else score
+
+        # Report the results using the same ordering that the caller used.
+        return {pair: found_scores[self.pair_key(*pair)]
+                for pair in hash_pairs if self.pair_key(*pair) in found_scores}
+
+    def put_many(self, method_name, config_hash, scores):
+        """
+        Store the scores of many pairs at once. Existing entries for the same
+        pairs are overwritten.
+
+        Args:
+            method_name (str): The name of the method (e.g. "SMPC").
+            config_hash (str): The hash of the method's configuration.
+            scores (dict):
+                A dict whose keys are (content_hash_a, content_hash_b) tuples
+                and whose values are the scores of those pairs.
+        """
+        rows = [(*self.pair_key(*pair), method_name, config_hash, float(score))
+                for pair, score in scores.items()]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO pair_scores VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def evict_stale(self, method_name, current_config_hash):
+        """
+        Delete every score that a method produced under a configuration other
+        than its current one. These scores can never be served again, so
+        there is no reason to keep them.
+
+        Args:
+            method_name (str): The name of the method (e.g. "SMPC").
+            current_config_hash (str): The hash of the method's current configuration.
+
+        Returns:
+            int: The number of scores deleted.
+        """
+        with self.connection:
+            cursor = self.connection.execute(
+                "DELETE FROM pair_scores WHERE method = ? AND config_hash != ?",
+                (method_name, current_config_hash),
+            )
+        return cursor.rowcount
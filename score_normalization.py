@@ -0,0 +1,175 @@
+"""
+This module normalizes similarity scores without needing to hold them all in
+memory.
+
+The drivers write raw scores to the output CSV as soon as they are computed,
+and feed each score to a normalizer on the way. Once every score has been
+written, `normalize_csv_scores()` makes a second pass over the CSV, replacing
+each raw score with its normalized value.
+
+Two normalizers are available, and `make_normalizer()` picks one by name:
+
+    * "min-max" (StreamingMinMax): Min-Max normalization, which maps the
+      scores onto the range 0 to 1.
+    * "percentile" (ScoreHistogram): Percentile normalization, which maps each
+      score to the fraction of all scores that are less than or equal to it.
+
+Made by Scott Sanchez and Mihir Bhakta for CS5300: Introduction to Artificial Intelligence.
+"""
+import csv
+import math
+import os
+
+
+class StreamingMinMax:
+    def __init__(self):
+        """
+        Keep track of the smallest and largest scores seen so far.
+        """
+        self.min_value = None
+        self.max_value = None
+
+    def update(self, score):
+        """
+        Record one raw score.
+
+        Args:
+            score (float): The raw score.
+        """
+        if self.min_value is None or score < self.min_value:
+            self.min_value = score
+        if self.max_value is None or score > self.max_value:
+            self.max_value = score
+
+    def normalize(self, score):
+        """
+        Normalize a raw score to a range between 0 and 1 using Min-Max
+        normalization, based on every score recorded so far.
+
+        Args:
+            score (float): The raw score.
+
+        Returns:
+            float: The normalized score.
+        """
+        if self.max_value == self.min_value:
+            # If all values are the same, normalize them to 1.0. We do this
+            # manually, because running the calculation would require dividing
+            # by zero.
+            return 1.0
+        return (score - self.min_value) / (self.max_value - self.min_value)
+
+
+class ScoreHistogram:
+    def __init__(self, bin_width=1.0):
+        """
+        Keep a histogram of the scores seen so far, which is used to turn a
+        score into a percentile. Only the number of scores in each bin is
+        kept, so the memory used depends on the range of the scores, not on
+        how many there are.
+
+        Args:
+            bin_width (float):
+                The width of each bin. SMPC scores are whole numbers, so with
+                the default width of 1 the percentiles are exact.
+        """
+        self.bin_width = bin_width
+        self.bin_counts = {}
+        self.total_count = 0
+        self.cumulative_counts = None
+
+    def _bin(self, score):
+        return math.floor(score / self.bin_width)
+
+    def update(self, score):
+        """
+        Record one raw score.
+
+        Args:
+            score (float): The raw score.
+        """
+        score_bin = self._bin(score)
+        self.bin_counts[score_bin] = self.bin_counts.get(score_bin, 0) + 1
+        self.total_count += 1
+        self.cumulative_counts = None
+
+    def normalize(self, score):
+        """
+        Return the fraction of the recorded scores that fall in the same bin
+        as the given score, or in a lower bin.
+
+        Args:
+            score (float): The raw score.
+
+        Returns:
+            float: The score's percentile, between 0 and 1.
+        """
+        if self.cumulative_counts is None:
+            # Work out, once, how many scores fall in or below each bin.
+            self.cumulative_counts = {}
+            running_count = 0
+            for score_bin in sorted(self.bin_counts):
+                running_count += self.bin_counts[score_bin]
+                self.cumulative_counts[score_bin] = running_count
+
+        score_bin = self._bin(score)
+        if score_bin in self.cumulative_counts:
+            return self.cumulative_counts[score_bin] / self.total_count
+
+        # The score was never recorded, so count every bin below it.
+        lower_count = sum(count for b, count in self.bin_counts.items() if b < score_bin)
+        return lower_count / self.total_count
+
+
+NORMALIZERS = {
+    'min-max': StreamingMinMax,
+    'percentile': ScoreHistogram,
+}
+
+
+def make_normalizer(name):
+    """
+    Create a new normalizer.
+
+    Args:
+        name (str): The name of the normalization to use: "min-max" or "percentile".
+
+    Returns:
+        StreamingMinMax or ScoreHistogram: The new normalizer.
+    """
+    return NORMALIZERS[name]()
+
+
+def normalize_csv_scores(csv_path, method_name, normalizer, score_column='Similarity Score'):
+    """
+    Replace the raw scores of one method in a results CSV with their
+    normalized values. Rows belonging to other methods are copied unchanged.
+
+    The file is read and rewritten one row at a time, and the new file
+    replaces the old one only once it is complete.
+
+    Args:
+        csv_path (str): The path of the results CSV.
+        method_name (str): The name of the method whose scores to normalize (e.g. "SMPC").
+        normalizer (StreamingMinMax or ScoreHistogram):
+            A normalizer that has already seen every raw score of that method.
+        score_column (str): The name of the column that holds the scores.
+    """
+    temp_path = f"{csv_path}.tmp"
+
+    with open(csv_path, mode='r', newline='') as input_file, \
+            open(temp_path, mode='w', newline='') as output_file:
+        reader = csv.reader(input_file)
+        writer = csv.writer(output_file)
+
+        header = next(reader)
+        writer.writerow(header)
+        method_index = header.index('Method')
+        score_index = header.index(score_column)
+
+        for row in reader:
+            if row[method_index] == method_name:
+                row[score_index] = normalizer.normalize(float(row[score_index]))
+            writer.writerow(row)
+
+    os.replace(temp_path, csv_path)
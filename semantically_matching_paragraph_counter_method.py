@@ -9,6 +9,16 @@ from comparison_util import ComparisonUtil
 class SmpcMethod:
     function_words = None  # Class-level constant for the common words wordlist
     core_vocab_words = None  # Class-level constant for the medium-frequency wordlist
+    TOP_N_WORDS = 10  # Class-level constant for the number of most-frequent words compared
+
+    # Essays are often written to the same prompts and quote the same passages,
+    # so many paragraphs recur across the corpus. Each unique paragraph is
+    # processed only once, and given an ID that indexes the lists below.
+    paragraph_ids = {}  # {paragraph hash: paragraph ID}
+    paragraph_words = []  # The processed words of each unique paragraph
+    paragraph_signatures = []  # The set of most frequent words of each unique paragraph
+    text_signatures = {}  # {text hash: (paragraph IDs, set of most frequent words of the text)}
+    interned_top_n_words = None  # The value of TOP_N_WORDS that the interned paragraphs were processed with
 
     @classmethod
     def load_wordlists(cls, function_words_path, core_vocab_path):
@@ -18,14 +28,50 @@ class SmpcMethod:
             * The list of "core vocab" words
 
         And store each as a class-level constant.
+
+        Interned paragraphs were processed with the old wordlists, so they are
+        forgotten whenever a wordlist is loaded.
         """
         if cls.function_words is None:  # Only load it once
             with open(function_words_path, 'r') as f:
                 cls.function_words = set(word.strip().lower() for word in f.readlines())
+            cls.clear_paragraph_cache()
 
         if cls.core_vocab_words is None:  # Only load it once
             with open(core_vocab_path, 'r') as f:
                 cls.core_vocab_words = set(word.strip().lower() for word in f.readlines())
+            cls.clear_paragraph_cache()
+
+    @classmethod
+    def clear_paragraph_cache(cls):
+        """
+        Forget every interned paragraph and text. This happens whenever the
+        wordlists are loaded or `TOP_N_WORDS` changes, since those change how
+        paragraphs are processed.
+        """
+        cls.paragraph_ids = {}
+        cls.paragraph_words = []
+        cls.paragraph_signatures = []
+        cls.text_signatures = {}
+        cls.interned_top_n_words = cls.TOP_N_WORDS
+
+    @classmethod
+    def get_config(cls):
+        """
+        Return the parameters that affect this method's similarity scores.
+        Changing any of them (including editing either wordlist) changes the
+        scores, so cached scores are keyed by this configuration.
+
+        The wordlists must be loaded before calling this.
+
+        Returns:
+            dict: The method's configuration.
+        """
+        return {
+            'top_n_words': cls.TOP_N_WORDS,
+            'function_words': hashlib.sha256(' '.join(sorted(cls.function_words)).encode('utf-8')).hexdigest(),
+            'core_vocab_words': hashlib.sha256(' '.join(sorted(cls.core_vocab_words)).encode('utf-8')).hexdigest(),
+        }
 
     @staticmethod
     def remove_function_words(paragraphs):
@@ -123,18 +169,22 @@ class SmpcMethod:
         return similarity_score
 
     @staticmethod
-    def most_frequent_words(paragraphs, top_n=10):
+    def most_frequent_words(paragraphs, top_n=None):
         """
         Find and return a list of the top N most frequent words the given input.
 
         Args:
             paragraphs (list of list of str): A list of paragraphs, where each paragraph
             is represented as a list of words.
-            top_n (int): The number of most-frequent words to return.
+            top_n (int): The number of most-frequent words to return. Defaults
+            to `SmpcMethod.TOP_N_WORDS`.
 
         Returns:
             list of str: The N most frequent words across all paragraphs.
         """
+        if top_n is None:
+            top_n = SmpcMethod.TOP_N_WORDS
+
         # Flatten the list of paragraphs into a single list of words
         all_words = [word.lower() for paragraph in paragraphs for word in paragraph]
 
@@ -144,48 +194,89 @@ class SmpcMethod:
         # Return the top N most frequent words
         return [word for word, _ in word_counts.most_common(top_n)]
 
-    @staticmethod
-    def compare_texts(text1, text2):
+    @classmethod
+    def intern_paragraph(cls, paragraph):
         """
-        Main function to compare two texts using the method steps
+        Return the ID of the given paragraph, processing it first if this is
+        the first time it has been seen. Processing means removing function
+        words, replacing core vocab words with synonyms, and finding the
+        paragraph's most frequent words.
+
+        Args:
+            paragraph (list of str): A cleaned paragraph, as a list of words.
+
+        Returns:
+            int: The paragraph's ID.
         """
-        # Step 1: "Clean" the text, converting it to lowercase and removing punctuation.
-        text1 = ComparisonUtil.clean_text(text1)
-        text2 = ComparisonUtil.clean_text(text2)
+        paragraph_hash = hashlib.sha1(' '.join(paragraph).encode('utf-8')).digest()
+        paragraph_id = cls.paragraph_ids.get(paragraph_hash)
 
-        # Step 2: Split the text into an array of arrays of strings.
-        paragraphs1 = SmpcMethod.text_to_paragraphs(text1)
-        paragraphs2 = SmpcMethod.text_to_paragraphs(text2)
+        if paragraph_id is None:
+            processed_paragraph = cls.replace_core_vocab_with_synonyms(cls.remove_function_words([paragraph]))[0]
 
-        # Step 2: Remove common words; they don't add much to a text's meaning.
-        paragraphs1 = SmpcMethod.remove_function_words(paragraphs1)
-        paragraphs2 = SmpcMethod.remove_function_words(paragraphs2)
+            paragraph_id = len(cls.paragraph_words)
+            cls.paragraph_ids[paragraph_hash] = paragraph_id
+            cls.paragraph_words.append(tuple(processed_paragraph))
+            cls.paragraph_signatures.append(frozenset(cls.most_frequent_words([processed_paragraph])))
 
-        # Step 3: Replace medium-frequency words with synonyms
-        paragraphs1 = SmpcMethod.replace_core_vocab_with_synonyms(paragraphs1)
-        paragraphs2 = SmpcMethod.replace_core_vocab_with_synonyms(paragraphs2)
+        return paragraph_id
 
-        # Step 5: Initial large-scale check (compare most frequent words) across the whole of both texts
-        most_freq_words_1 = SmpcMethod.most_frequent_words(paragraphs1)
-        most_freq_words_2 = SmpcMethod.most_frequent_words(paragraphs2)
+    @classmethod
+    def intern_text(cls, text):
+        """
+        Split the text into paragraphs and intern each of them, then find the
+        most frequent words across the whole text. The result is remembered,
+        since each text is compared with every other text.
+
+        Args:
+            text (str): The raw text.
+
+        Returns:
+            tuple: A tuple containing:
+                - paragraph_ids (list of int): The ID of each of the text's paragraphs, in order.
+                - most_freq_words (frozenset of str): The N most frequent words across the whole text.
+        """
+        if cls.interned_top_n_words != cls.TOP_N_WORDS:
+            cls.clear_paragraph_cache()
+
+        text_hash = hashlib.sha1(text.encode('utf-8')).digest()
+
+        if text_hash not in cls.text_signatures:
+            paragraphs = cls.text_to_paragraphs(ComparisonUtil.clean_text(text))
+            paragraph_ids = [cls.intern_paragraph(paragraph) for paragraph in paragraphs]
 
-        if len(set(most_freq_words_1).intersection(most_freq_words_2)) < 3:
+            most_freq_words = frozenset(cls.most_frequent_words(
+                [cls.paragraph_words[paragraph_id] for paragraph_id in paragraph_ids]))
+            cls.text_signatures[text_hash] = (paragraph_ids, most_freq_words)
+
+        return cls.text_signatures[text_hash]
+
+    @staticmethod
+    def compare_texts(text1, text2):
+        """
+        Main function to compare two texts using the method steps
+        """
+        # Steps 1-4: Clean each text, split it into paragraphs, remove common
+        # words, and replace medium-frequency words with synonyms. Each unique
+        # paragraph in the corpus only goes through these steps once.
+        paragraph_ids_1, most_freq_words_1 = SmpcMethod.intern_text(text1)
+        paragraph_ids_2, most_freq_words_2 = SmpcMethod.intern_text(text2)
+
+        # Step 5: Initial large-scale check (compare most frequent words) across the whole of both texts
+        if len(most_freq_words_1 & most_freq_words_2) < 3:
             return 0  # Not similar if fewer than 3 common frequent words
 
         # Step 6: Compare paragraphs and count matching pairs
 
-        # Start by finding the most common words in each paragraph of both texts.
-        most_freq_words_by_paragraph_1 = [SmpcMethod.most_frequent_words([paragraph]) for paragraph in paragraphs1]
-        most_freq_words_by_paragraph_2 = [SmpcMethod.most_frequent_words([paragraph]) for paragraph in paragraphs2]
-
         # Compare the most frequent words in paragraph A with the most common words in paragraph B.
         # If they share at least 3 words on their top ten words, then the two paragraphs are said
         # to be a "matching pair".
         matching_pairs = 0
 
-        for para1_freq_words in most_freq_words_by_paragraph_1:
-            for para2_freq_words in most_freq_words_by_paragraph_2:
-                if len(set(para1_freq_words).intersection(para2_freq_words)) > 2:
+        for paragraph_id_1 in paragraph_ids_1:
+            para1_freq_words = SmpcMethod.paragraph_signatures[paragraph_id_1]
+            for paragraph_id_2 in paragraph_ids_2:
+                if len(para1_freq_words & SmpcMethod.paragraph_signatures[paragraph_id_2]) > 2:
                     matching_pairs += 1
 
         return matching_pairs  # The final similarity score
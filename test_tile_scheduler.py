@@ -0,0 +1,230 @@
+"""
+Checks for the tile scheduler. These run claim, lease renewal, expiry,
+failure and completion through a real `FileTileQueue` in a temporary
+directory.
+
+Run them with pytest, or directly with `python test_tile_scheduler.py`.
+
+Made by Scott Sanchez and Mihir Bhakta for CS5300: Introduction to Artificial Intelligence.
+"""
+import csv
+import os
+import tempfile
+import threading
+import time
+
+from tile_scheduler import FileTileQueue, make_tiles, process_tile, run_worker, wait_for_tiles
+
+
+class LengthMethod:
+    """A stand-in comparison method, which is fast and needs no wordlists."""
+
+    @staticmethod
+    def compare_texts(text_a, text_b):
+        return len(text_a) + len(text_b)
+
+
+class SlowMethod:
+    """A stand-in comparison method that takes a while per pair."""
+
+    @staticmethod
+    def compare_texts(text_a, text_b):
+        time.sleep(0.02)
+        return 0
+
+
+def tile_states(queue, tile_id):
+    """Return every state the tile is currently in."""
+    return [state for state in FileTileQueue.STATES if os.path.exists(queue._path(state, tile_id))]
+
+
+def test_tiles_cover_every_pair_once():
+    for num_docs, tile_size in [(1, 3), (7, 3), (10, 5), (57, 10)]:
+        pairs = [pair for tile in make_tiles(num_docs, tile_size) for pair in tile.pairs()]
+        assert sorted(pairs) == [(i, j) for i in range(num_docs) for j in range(i + 1, num_docs)]
+
+
+def test_claim_and_complete():
+    with tempfile.TemporaryDirectory() as queue_dir:
+        queue = FileTileQueue(queue_dir)
+        queue.put_tiles(make_tiles(10, 5))
+
+        tile = queue.claim()
+        assert tile_states(queue, tile.tile_id) == ['claimed']
+        queue.complete(tile)
+        assert tile_states(queue, tile.tile_id) == ['done']
+        assert queue.counts() == {'pending': 2, 'claimed': 0, 'done': 1, 'failed': 0}
+
+
+def test_fail_retries_until_out_of_attempts():
+    with tempfile.TemporaryDirectory() as queue_dir:
+        queue = FileTileQueue(queue_dir, max_attempts=2)
+        queue.put_tiles(make_tiles(3, 3))
+
+        queue.fail(queue.claim())
+        assert queue.counts()['pending'] == 1
+
+        tile = queue.claim()
+        assert tile.attempts == 1
+        queue.fail(tile)
+        assert queue.counts() == {'pending': 0, 'claimed': 0, 'done': 0, 'failed': 1}
+        assert queue.claim() is None
+        assert queue.is_finished()
+
+
+def test_expired_lease_is_requeued_but_renewed_lease_is_not():
+    with tempfile.TemporaryDirectory() as queue_dir:
+        queue = FileTileQueue(queue_dir, lease_seconds=0.2)
+        queue.put_tiles(make_tiles(10, 5))
+        abandoned_tile = queue.claim()
+        renewed_tile = queue.claim()
+
+        for _ in range(4):
+            time.sleep(0.1)
+            assert queue.renew(renewed_tile)
+
+        assert queue.requeue_expired() == 1
+        assert tile_states(queue, abandoned_tile.tile_id) == ['pending']
+        assert tile_states(queue, renewed_tile.tile_id) == ['claimed']
+        assert not queue.renew(abandoned_tile)
+
+
+def test_complete_after_requeue_leaves_one_state():
+    with tempfile.TemporaryDirectory() as queue_dir:
+        queue = FileTileQueue(queue_dir, lease_seconds=0, max_attempts=1)
+        queue.put_tiles(make_tiles(3, 3))
+        tile = queue.claim()
+
+        # The lease runs out and the tile is given up on, but the worker
+        # was only slow, and finishes it after all.
+        time.sleep(0.01)
+        queue.requeue_expired()
+        assert tile_states(queue, tile.tile_id) == ['failed']
+        queue.complete(tile)
+        assert tile_states(queue, tile.tile_id) == ['done']
+
+
+def test_requeue_does_not_delete_a_new_claim():
+    with tempfile.TemporaryDirectory() as queue_dir:
+        coordinator_queue = FileTileQueue(queue_dir, lease_seconds=0)
+        worker_queue = FileTileQueue(queue_dir)
+        coordinator_queue.put_tiles(make_tiles(3, 3))
+        worker_queue.claim()
+
+        # An idle worker claims the tile the moment the coordinator puts it
+        # back, before the coordinator has finished releasing it.
+        new_claims = []
+        write = coordinator_queue._write
+
+        def write_then_claim(state, tile):
+            write(state, tile)
+            new_claims.append(worker_queue.claim())
+
+        coordinator_queue._write = write_then_claim
+        time.sleep(0.01)
+        assert coordinator_queue.requeue_expired() == 1
+
+        new_tile = new_claims[0]
+        assert new_tile is not None
+        assert tile_states(coordinator_queue, new_tile.tile_id) == ['claimed']
+        assert not coordinator_queue.is_finished()
+        assert worker_queue.renew(new_tile)
+
+
+def test_stale_worker_cannot_touch_a_new_claim():
+    with tempfile.TemporaryDirectory() as queue_dir:
+        queue = FileTileQueue(queue_dir, lease_seconds=0)
+        queue.put_tiles(make_tiles(3, 3))
+        stale_tile = queue.claim()
+
+        # The first worker's lease runs out, and the tile goes to a second worker.
+        time.sleep(0.01)
+        assert queue.requeue_expired() == 1
+        live_tile = queue.claim()
+        assert live_tile.claim_token != stale_tile.claim_token
+
+        # The first worker then fails, or tries to renew. Neither may affect
+        # the second worker's claim.
+        assert not queue.renew(stale_tile)
+        queue.fail(stale_tile)
+        assert tile_states(queue, live_tile.tile_id) == ['claimed']
+        assert queue._read(queue._path('claimed', live_tile.tile_id)).attempts == 1
+        assert queue.renew(live_tile)
+
+
+def test_slow_worker_keeps_its_tiles():
+    with tempfile.TemporaryDirectory() as queue_dir:
+        output_dir = os.path.join(queue_dir, 'outputs')
+        os.makedirs(output_dir)
+        queue = FileTileQueue(queue_dir, lease_seconds=0.5, max_attempts=1)
+
+        # Each tile takes about 1 second, twice the lease.
+        queue.put_tiles(make_tiles(30, 10))
+        essay_ids = [f"essay{i}" for i in range(30)]
+        essay_texts = ["x" * i for i in range(30)]
+
+        worker = threading.Thread(target=run_worker,
+                                  args=(queue, essay_ids, essay_texts, [('Slow', SlowMethod)], output_dir),
+                                  kwargs={'poll_seconds': 0.05, 'renew_seconds': 0.1})
+        worker.start()
+        counts = wait_for_tiles(queue, poll_seconds=0.1)
+        worker.join()
+
+        assert counts == {'pending': 0, 'claimed': 0, 'done': 6, 'failed': 0}
+
+
+def test_workers_write_every_pair():
+    with tempfile.TemporaryDirectory() as queue_dir:
+        output_dir = os.path.join(queue_dir, 'outputs')
+        os.makedirs(output_dir)
+        queue = FileTileQueue(queue_dir)
+        tiles = make_tiles(23, 4)
+        queue.put_tiles(tiles)
+        essay_ids = [f"essay{i}" for i in range(23)]
+        essay_texts = ["x" * i for i in range(23)]
+
+        run_worker(queue, essay_ids, essay_texts, [('Length', LengthMethod)], output_dir)
+
+        rows = []
+        for file_name in os.listdir(output_dir):
+            with open(os.path.join(output_dir, file_name), 'r', newline='') as file:
+                rows.extend(list(csv.reader(file))[1:])
+        assert len(os.listdir(output_dir)) == len(tiles)
+        assert sorted((row[1], row[2]) for row in rows) == sorted(
+            (essay_ids[i], essay_ids[j]) for i in range(23) for j in range(i + 1, 23))
+
+
+def test_failed_tile_output_is_not_left_behind():
+    class BrokenMethod:
+        @staticmethod
+        def compare_texts(text_a, text_b):
+            raise ValueError("broken")
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        tile = make_tiles(3, 3)[0]
+        try:
+            process_tile(tile, ['a', 'b', 'c'], ['a', 'b', 'c'], [('Broken', BrokenMethod)], output_dir)
+        except ValueError:
+            pass
+        assert os.listdir(output_dir) == []
+
+
+def test_missing_output_dir_error_is_kept():
+    with tempfile.TemporaryDirectory() as queue_dir:
+        missing_dir = os.path.join(queue_dir, 'missing')
+        tile = make_tiles(3, 3)[0]
+        try:
+            process_tile(tile, ['a', 'b', 'c'], ['a', 'b', 'c'], [('Length', LengthMethod)], missing_dir)
+        except FileNotFoundError as error:
+            # The error is about the temporary output file that could not be
+            # created, not a second error from cleaning it up.
+            assert error.__context__ is None
+        else:
+            assert False, "process_tile should fail when the output directory is missing"
+
+
+if __name__ == '__main__':
+    for name, check in list(globals().items()):
+        if name.startswith('test_'):
+            check()
+            print(f"{name}: ok")
@@ -0,0 +1,458 @@
+"""
+This module splits an all-pairs comparison into tiles, and hands those tiles
+out to workers through a queue, so that one comparison job can be spread
+across several processes or machines.
+
+The essays are numbered 0 to N-1. Comparing every essay with every other
+essay means computing every pair (i, j) with i < j, i.e. the upper triangle
+of an N x N grid. That triangle is cut into square tiles:
+
+    * A coordinator puts every tile on the queue, then waits for them to be
+      finished, putting back any tile whose worker died or stalled.
+    * Workers repeatedly take a tile from the queue, compare every pair in
+      it, write the scores to a tile output file, and mark the tile done.
+
+`TileQueue` describes what a queue must be able to do. `FileTileQueue` is a
+queue kept in a directory on a shared filesystem, which lets the whole thing
+run with several worker processes on one machine, or on several machines that
+mount the same directory.
+
+Made by Scott Sanchez and Mihir Bhakta for CS5300: Introduction to Artificial Intelligence.
+"""
+import csv
+import json
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+
+
+def _remove_if_exists(path):
+    """Remove the file at the given path, if there is one."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class Tile:
+    def __init__(self, tile_id, row_start, row_end, col_start, col_end, attempts=0, claim_token=None):
+        """
+        A rectangular block of the pair grid. The tile covers every pair
+        (i, j) with row_start <= i < row_end, col_start <= j < col_end and
+        i < j.
+
+        Args:
+            tile_id (int): A number that uniquely identifies the tile.
+            row_start (int): The first row (essay A index) in the tile.
+            row_end (int): One past the last row in the tile.
+            col_start (int): The first column (essay B index) in the tile.
+            col_end (int): One past the last column in the tile.
+            attempts (int): How many times the tile has been handed out and lost or failed.
+            claim_token (str):
+                A value that is unique to each claim of the tile, so that a
+                worker can tell whether it still holds the tile. None while
+                the tile is not claimed.
+        """
+        self.tile_id = tile_id
+        self.row_start = row_start
+        self.row_end = row_end
+        self.col_start = col_start
+        self.col_end = col_end
+        self.attempts = attempts
+        self.claim_token = claim_token
+
+    def pairs(self):
+        """
+        Return every pair of essay indexes covered by this tile.
+
+        Returns:
+            list of tuple of int: A list of (i, j) tuples, with i < j.
+        """
+        return [(i, j)
+                for i in range(self.row_start, self.row_end)
+                for j in range(max(self.col_start, i + 1), self.col_end)]
+
+    def to_dict(self):
+        return {'tile_id': self.tile_id, 'row_start': self.row_start, 'row_end': self.row_end,
+                'col_start': self.col_start, 'col_end': self.col_end, 'attempts': self.attempts,
+                'claim_token': self.claim_token}
+
+    @staticmethod
+    def from_dict(data):
+        return Tile(data['tile_id'], data['row_start'], data['row_end'],
+                    data['col_start'], data['col_end'], data.get('attempts', 0), data.get('claim_token'))
+
+
+def make_tiles(num_docs, tile_size):
+    """
+    Split the upper triangle of the pair grid into square tiles.
+
+    Tiles on the diagonal are triangles, since they only contain pairs with
+    i < j. Every pair (i, j) with i < j belongs to exactly one tile.
+
+    Args:
+        num_docs (int): The number of essays being compared.
+        tile_size (int): The number of rows and columns in each tile.
+
+    Returns:
+        list of Tile: The tiles.
+    """
+    tiles = []
+    for row_start in range(0, num_docs, tile_size):
+        for col_start in range(row_start, num_docs, tile_size):
+            tiles.append(Tile(len(tiles), row_start, min(row_start + tile_size, num_docs),
+                              col_start, min(col_start + tile_size, num_docs)))
+    return tiles
+
+
+class TileQueue(ABC):
+    """
+    The operations that every tile queue backend must provide. A tile is
+    always in exactly one of four states: pending (waiting for a worker),
+    claimed (being worked on), done, or failed (given up on after too many
+    attempts).
+    """
+
+    @abstractmethod
+    def put_tiles(self, tiles):
+        """Add the given tiles to the queue as pending tiles."""
+
+    @abstractmethod
+    def claim(self):
+        """
+        Take one pending tile and mark it as claimed.
+
+        Returns:
+            Tile: The claimed tile, or None if no tile is pending.
+        """
+
+    @abstractmethod
+    def renew(self, tile):
+        """
+        Renew the lease on a claimed tile. A worker calls this regularly while
+        it processes the tile, to show that it is still alive. Nothing happens
+        if the tile has since been handed to another worker.
+
+        Returns:
+            bool: Whether the tile was still claimed by this worker.
+        """
+
+    @abstractmethod
+    def complete(self, tile):
+        """Mark a claimed tile as done."""
+
+    @abstractmethod
+    def fail(self, tile):
+        """
+        Give a claimed tile back after its worker failed to process it. The
+        tile is retried, unless it has already used up its attempts. Nothing
+        happens if the tile has since been handed to another worker.
+        """
+
+    @abstractmethod
+    def requeue_expired(self):
+        """
+        Put back every claimed tile whose lease has run out (i.e. whose worker
+        has not renewed it in time, and has probably died), so that another
+        worker can retry it.
+
+        Returns:
+            int: The number of tiles put back.
+        """
+
+    @abstractmethod
+    def counts(self):
+        """
+        Returns:
+            dict: The number of tiles in each state, keyed by state name.
+        """
+
+    def is_finished(self):
+        """Return whether every tile is either done or failed."""
+        counts = self.counts()
+        return counts['pending'] == 0 and counts['claimed'] == 0
+
+
+class FileTileQueue(TileQueue):
+    STATES = ('pending', 'claimed', 'done', 'failed')
+
+    def __init__(self, queue_dir, lease_seconds=600, max_attempts=3):
+        """
+        A tile queue kept in a directory. Each tile is a small JSON file, and
+        its state is the sub-directory it is in. Tiles are moved between
+        sub-directories with `os.rename()`, which is atomic, so two workers
+        can never claim the same tile.
+
+        Args:
+            queue_dir (str): The directory that holds the queue.
+            lease_seconds (float):
+                How long a worker may go without renewing its tile before the
+                coordinator assumes the worker is lost and gives the tile to
+                someone else.
+            max_attempts (int): How many times a tile may be lost or fail before it is given up on.
+        """
+        self.queue_dir = queue_dir
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        for state in FileTileQueue.STATES:
+            os.makedirs(os.path.join(queue_dir, state), exist_ok=True)
+
+    def _path(self, state, tile_id):
+        return os.path.join(self.queue_dir, state, f"tile_{tile_id:08d}.json")
+
+    def _write(self, state, tile):
+        """Atomically write a tile's file into the given state directory."""
+        temp_path = os.path.join(self.queue_dir, f".tile_{tile.tile_id:08d}.{uuid.uuid4().hex}.tmp")
+        with open(temp_path, 'w') as f:
+            json.dump(tile.to_dict(), f)
+        os.replace(temp_path, self._path(state, tile.tile_id))
+
+    def _read(self, path):
+        with open(path, 'r') as f:
+            return Tile.from_dict(json.load(f))
+
+    def put_tiles(self, tiles):
+        for tile in tiles:
+            self._write('pending', tile)
+
+    def claim(self):
+        for file_name in sorted(os.listdir(os.path.join(self.queue_dir, 'pending'))):
+            pending_path = os.path.join(self.queue_dir, 'pending', file_name)
+            claimed_path = os.path.join(self.queue_dir, 'claimed', file_name)
+            try:
+                # The claimed file's modification time marks the start of the
+                # lease. It is set before the move, so the coordinator never
+                # sees a claimed tile with a stale time.
+                os.utime(pending_path)
+                os.rename(pending_path, claimed_path)
+            except FileNotFoundError:
+                continue  # Another worker claimed this tile first
+
+            if os.path.exists(os.path.join(self.queue_dir, 'done', file_name)):
+                # A stray copy of a tile that has already been finished.
+                _remove_if_exists(claimed_path)
+                continue
+
+            try:
+                tile = self._read(claimed_path)
+            except FileNotFoundError:
+                continue  # The tile was finished or put back in the meantime
+
+            # Mark the claim as this worker's own. The lease was just started,
+            # so nobody else touches the claimed file in the meantime.
+            tile.claim_token = uuid.uuid4().hex
+            self._write('claimed', tile)
+            return tile
+        return None
+
+    def _holds_claim(self, tile):
+        """Return whether the claimed copy of the tile belongs to the given claim."""
+        try:
+            return self._read(self._path('claimed', tile.tile_id)).claim_token == tile.claim_token
+        except FileNotFoundError:
+            return False
+
+    def renew(self, tile):
+        if not self._holds_claim(tile):
+            return False
+
+        # The claimed file's modification time is the time of the last renewal.
+        try:
+            os.utime(self._path('claimed', tile.tile_id))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def complete(self, tile):
+        try:
+            os.rename(self._path('claimed', tile.tile_id), self._path('done', tile.tile_id))
+        except FileNotFoundError:
+            # The lease ran out and the tile was put back, or handed to another
+            # worker. The output has been written anyway, so the tile is done.
+            self._write('done', tile)
+
+        # Remove any other copy, so that the tile is only ever in one state.
+        for state in ('pending', 'claimed', 'failed'):
+            _remove_if_exists(self._path(state, tile.tile_id))
+
+    def fail(self, tile):
+        if self._holds_claim(tile):
+            self._release(self._path('claimed', tile.tile_id), claim_token=tile.claim_token)
+
+    def requeue_expired(self):
+        requeued = 0
+        now = time.time()
+        claimed_dir = os.path.join(self.queue_dir, 'claimed')
+        for file_name in os.listdir(claimed_dir):
+            claimed_path = os.path.join(claimed_dir, file_name)
+            try:
+                expired = now - os.path.getmtime(claimed_path) > self.lease_seconds
+            except FileNotFoundError:
+                continue  # The tile was finished while we were looking at it
+            if expired and self._release(claimed_path, only_if_expired=True):
+                requeued += 1
+        return requeued
+
+    def counts(self):
+        return {state: len([name for name in os.listdir(os.path.join(self.queue_dir, state))
+                            if name.endswith('.json')])
+                for state in FileTileQueue.STATES}
+
+    def _release(self, claimed_path, only_if_expired=False, claim_token=None):
+        """
+        Take a tile out of the claimed state, counting one more attempt. The
+        tile goes back to pending, or to failed if it is out of attempts.
+
+        The claimed file is first moved to a private name, so it has left
+        `claimed/` before the new copy is published. Otherwise a worker could
+        claim the new copy into the same path, and have its claim deleted.
+
+        Args:
+            claimed_path (str): The path of the claimed tile's file.
+            only_if_expired (bool): Put the tile back in `claimed/` if its lease was renewed in the meantime.
+            claim_token (str): If given, put the tile back in `claimed/` unless it belongs to this claim.
+
+        Returns:
+            bool: Whether the tile was released (False if it was no longer claimed).
+        """
+        releasing_path = os.path.join(self.queue_dir, f".releasing.{uuid.uuid4().hex}.tmp")
+        try:
+            os.rename(claimed_path, releasing_path)
+        except FileNotFoundError:
+            return False
+
+        tile = self._read(releasing_path)
+
+        # The rename keeps the modification time, i.e. the time of the last renewal.
+        renewed = only_if_expired and time.time() - os.path.getmtime(releasing_path) <= self.lease_seconds
+        if renewed or (claim_token is not None and tile.claim_token != claim_token):
+            os.rename(releasing_path, claimed_path)
+            return False
+        os.remove(releasing_path)
+
+        tile.attempts += 1
+        tile.claim_token = None
+        state = 'failed' if tile.attempts >= self.max_attempts else 'pending'
+        self._write(state, tile)
+
+        if os.path.exists(self._path('done', tile.tile_id)):
+            # The worker finished the tile while it was being put back.
+            _remove_if_exists(self._path(state, tile.tile_id))
+            return False
+        return True
+
+
+def tile_output_path(output_dir, tile):
+    """Return the path of the file that holds a tile's scores."""
+    return os.path.join(output_dir, f"tile_{tile.tile_id:08d}.csv")
+
+
+def process_tile(tile, essay_ids, essay_texts, methods, output_dir, heartbeat=None):
+    """
+    Compare every pair in a tile with each of the given methods, and write the
+    raw scores to the tile's output file.
+
+    The file is written under a temporary name and then renamed, so a tile
+    output file is either complete or absent, never half-written.
+
+    While it works, this calls `heartbeat()` after every pair, so that the
+    worker can keep its lease on the tile.
+
+    Args:
+        tile (Tile): The tile to process.
+        essay_ids (list): A list of essay IDs.
+        essay_texts (list): A list of all essay texts, in the same order as `essay_ids`.
+        methods (list of tuple): A list of (method_name, method_class) tuples.
+        output_dir (str): The directory to write the tile output file to.
+        heartbeat (callable): A function to call regularly while working, or None.
+    """
+    output_path = tile_output_path(output_dir, tile)
+    temp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+
+    try:
+        with open(temp_path, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['Method', 'Essay A ID', 'Essay B ID', 'Similarity Score'])
+            for method_name, method_class in methods:
+                for i, j in tile.pairs():
+                    similarity_score = method_class.compare_texts(essay_texts[i], essay_texts[j])
+                    writer.writerow([method_name, essay_ids[i], essay_ids[j], similarity_score])
+                    if heartbeat is not None:
+                        heartbeat()
+    except Exception:
+        # The temporary file may not exist, if opening it was what failed.
+        _remove_if_exists(temp_path)
+        raise
+
+    os.replace(temp_path, output_path)
+
+
+def run_worker(queue, essay_ids, essay_texts, methods, output_dir, poll_seconds=1.0, renew_seconds=10.0):
+    """
+    Take tiles from the queue and process them until every tile is finished.
+
+    Args:
+        queue (TileQueue): The queue to take tiles from.
+        essay_ids (list): A list of essay IDs.
+        essay_texts (list): A list of all essay texts, in the same order as `essay_ids`.
+        methods (list of tuple): A list of (method_name, method_class) tuples.
+        output_dir (str): The directory to write tile output files to.
+        poll_seconds (float): How long to wait before checking again when no tile is pending.
+        renew_seconds (float):
+            How often to renew the lease on the tile being processed. This
+            must be well below the queue's lease time.
+
+    Returns:
+        int: The number of tiles this worker completed.
+    """
+    completed = 0
+    while True:
+        tile = queue.claim()
+        if tile is None:
+            if queue.is_finished():
+                return completed
+            # Other workers still hold tiles, and may lose them.
+            time.sleep(poll_seconds)
+            continue
+
+        last_renewal = time.time()
+
+        def heartbeat():
+            nonlocal last_renewal
+            if time.time() - last_renewal >= renew_seconds:
+                queue.renew(tile)
+                last_renewal = time.time()
+
+        try:
+            process_tile(tile, essay_ids, essay_texts, methods, output_dir, heartbeat=heartbeat)
+        except Exception as error:
+            print(f"Tile {tile.tile_id} failed: {error!r}")
+            queue.fail(tile)
+            continue
+
+        queue.complete(tile)
+        completed += 1
+
+
+def wait_for_tiles(queue, poll_seconds=5.0):
+    """
+    Wait until every tile on the queue is done or failed, putting back tiles
+    whose leases run out. This is the coordinator's job once it has put the
+    tiles on the queue.
+
+    Args:
+        queue (TileQueue): The queue the tiles were handed out through.
+        poll_seconds (float): How often to check on the queue.
+
+    Returns:
+        dict: The number of tiles in each state once the run has finished.
+    """
+    while not queue.is_finished():
+        time.sleep(poll_seconds)
+        requeued = queue.requeue_expired()
+        if requeued:
+            print(f"Requeued {requeued} expired tiles.")
+        print(f"Tile progress: {queue.counts()}")
+
+    return queue.counts()